@@ -3,24 +3,32 @@
 from __future__ import annotations
 
 import abc
+import collections.abc
 import dataclasses
 import functools
 import io
+import mmap
 import struct
 import sys
 import typing
 
-from typing import Any, List, Tuple, Type, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type, Union
 
 from elfo._data import EI, ELFCLASS, ELFDATA, EM, ET, EV, OSABI, SHF, SHT
 from elfo._util import _Printable
 
 
 if sys.version_info >= (3, 8):
+    from functools import cached_property
     from typing import Literal
 else:
     from typing_extensions import Literal
 
+    cached_property = property
+
+if typing.TYPE_CHECKING:
+    import numpy
+
 
 class ELFException(Exception):
     pass
@@ -37,14 +45,99 @@ class NotAnELF(ELFException):
         return f'File is not an ELF file: {self._file}'
 
 
+@functools.lru_cache(maxsize=None)
+def _struct(unpack_format: str) -> struct.Struct:
+    return struct.Struct(unpack_format)
+
+
 def _unpack(description: Union[str, Tuple[str, ...]], fd: io.RawIOBase) -> Tuple[Any, ...]:
     if isinstance(description, tuple):
         unpack_format = ''.join(description)
     else:
         unpack_format = description
-    data = fd.read(struct.calcsize(unpack_format))
+    unpacker = _struct(unpack_format)
+    data = fd.read(unpacker.size)
     assert data
-    return struct.unpack(unpack_format, data)
+    return unpacker.unpack(data)
+
+
+@functools.lru_cache(maxsize=16)
+def _struct_for(cls: Any, file_class: int, data_encoding: int) -> struct.Struct:
+    """Compiled struct for a type with a _format method, for the given file class and encoding."""
+    return struct.Struct(cls._format(file_class, data_encoding))
+
+
+@functools.lru_cache(maxsize=16)
+def _constructor_for(cls: Any, file_class: int) -> Callable[..., Any]:
+    """Generates a constructor for a _DeriveSerialization type, specialized for the file class.
+
+    It takes the e_ident and the unpacked values, and sets the attributes directly, with the
+    type coercions inlined, instead of going through __init__ and __post_init__.
+    """
+    names = cls._field_names(file_class)
+    namespace = {'new': object.__new__, 'cls': cls}
+    lines = [
+        'def _from_tuple(e_ident, values):',
+        f'    {", ".join(names)}, = values',
+        '    obj = new(cls)',
+        '    obj._e_ident = e_ident',
+    ]
+    for name in names:
+        if name in cls._coercions:
+            namespace[f'_coerce_{name}'] = cls._coercions[name]
+            lines.append(f'    obj.{name} = _coerce_{name}({name})')
+        else:
+            lines.append(f'    obj.{name} = {name}')
+    lines.append('    return obj')
+    exec('\n'.join(lines), namespace)
+    return typing.cast(Callable[..., Any], namespace['_from_tuple'])
+
+
+def _endianess(data_encoding: int) -> str:
+    """struct.unpack/pack character for the endianess."""
+    if data_encoding == ELFDATA.LSB:
+        return '<'
+    elif data_encoding == ELFDATA.MSB:
+        return '>'
+    raise ValueError(f'Unkown endianess: {data_encoding}')
+
+
+def _native(file_class: int) -> str:
+    """struct.unpack/pack character for the native addresses."""
+    if file_class == ELFCLASS._32:
+        return 'I'
+    elif file_class == ELFCLASS._64:
+        return 'Q'
+    raise ValueError(f'Unkown class: {file_class}')
+
+
+# struct formats, keyed by the endianess and native address characters
+_EHDR_FMT = {
+    ('<', 'I'): '<HHIIIIIHHHHHH',
+    ('<', 'Q'): '<HHIQQQIHHHHHH',
+    ('>', 'I'): '>HHIIIIIHHHHHH',
+    ('>', 'Q'): '>HHIQQQIHHHHHH',
+}
+_SHDR_FMT = {
+    ('<', 'I'): '<IIIIIIIIII',
+    ('<', 'Q'): '<IIQQQQIIQQ',
+    ('>', 'I'): '>IIIIIIIIII',
+    ('>', 'Q'): '>IIQQQQIIQQ',
+}
+_PHDR_FMT = {
+    ('<', 'I'): '<IIIIIIII',
+    ('<', 'Q'): '<IIQQQQQQ',
+    ('>', 'I'): '>IIIIIIII',
+    ('>', 'Q'): '>IIQQQQQQ',
+}
+
+# struct format characters to numpy dtype codes
+_NUMPY_CODES = {
+    'B': 'u1',
+    'H': 'u2',
+    'I': 'u4',
+    'Q': 'u8',
+}
 
 
 @dataclasses.dataclass(repr=False)
@@ -70,33 +163,35 @@ class ELFHeader(_Printable):
 
             @classmethod
             def from_fd(cls, fd: io.RawIOBase) -> ELFHeader.types.e_ident:
-                magic = fd.read(4)
-                if magic != b'\x7fELF':
+                data = fd.read(EI.NIDENT)
+                if len(data) != EI.NIDENT or data[:4] != b'\x7fELF':
                     raise NotAnELF(fd)
-                obj = cls(
+                return cls(
                     b'\x7fELF',
-                    *_unpack('BBBBB', fd),
+                    data[EI.CLASS],
+                    data[EI.DATA],
+                    data[EI.VERSION],
+                    data[EI.OSABI],
+                    data[EI.ABIVERSION],
                 )
-                fd.read(EI.NIDENT - EI.PAD + 1)
-                return obj
 
-            @property
+            def __setattr__(self, name: str, value: Any) -> None:
+                super().__setattr__(name, value)
+                # invalidate the cached properties derived from the field
+                if name == 'data_encoding':
+                    self.__dict__.pop('endianess', None)
+                elif name == 'file_class':
+                    self.__dict__.pop('native', None)
+
+            @cached_property
             def endianess(self) -> str:
                 """struct.unpack/pack character for the endianess."""
-                if self.data_encoding == ELFDATA.LSB:
-                    return '<'
-                elif self.data_encoding == ELFDATA.LSB:
-                    return '>'
-                raise ValueError(f'Unkown endianess: {self.data_encoding}')
+                return _endianess(self.data_encoding)
 
-            @property
+            @cached_property
             def native(self) -> str:
-                """struct.unpack/pack character for the native addresses.."""
-                if self.file_class == ELFCLASS._32:
-                    return 'I'
-                elif self.file_class == ELFCLASS._64:
-                    return 'Q'
-                raise ValueError(f'Unkown class: {self.file_class}')
+                """struct.unpack/pack character for the native addresses."""
+                return _native(self.file_class)
 
             def __len__(self) -> int:
                 return EI.NIDENT
@@ -109,7 +204,7 @@ class ELFHeader(_Printable):
                     self.file_version,
                     self.os_abi,
                     self.abi_version,
-                ) + b'\x00' * (EI.NIDENT - EI.PAD + 1)
+                ) + b'\x00' * (EI.NIDENT - EI.PAD)
 
     e_ident: types.e_ident
     e_type: int
@@ -143,22 +238,15 @@ class ELFHeader(_Printable):
             )
 
     @staticmethod
-    def _format(e_ident: ELFHeader.types.e_ident) -> str:
-        return ''.join((
-            e_ident.endianess,
-            'HHI',
-            e_ident.native,
-            e_ident.native,
-            e_ident.native,
-            'IHHHHHH',
-        ))
+    def _format(file_class: int, data_encoding: int) -> str:
+        return _EHDR_FMT[_endianess(data_encoding), _native(file_class)]
 
     @classmethod
     def from_fd(cls, fd: io.RawIOBase) -> ELFHeader:
         e_ident = cls.types.e_ident.from_fd(fd)
         return cls(
             e_ident,
-            *_unpack(cls._format(e_ident), fd),
+            *_unpack(cls._format(e_ident.file_class, e_ident.data_encoding), fd),
         )
 
     def __len__(self) -> int:
@@ -169,8 +257,8 @@ class ELFHeader(_Printable):
         raise ValueError(f'Unkown class: {self.e_ident.file_class}')
 
     def __bytes__(self) -> bytes:
-        return bytes(self.e_ident) + struct.pack(
-            self._format(self.e_ident),
+        packer = _struct(self._format(self.e_ident.file_class, self.e_ident.data_encoding))
+        return bytes(self.e_ident) + packer.pack(
             self.e_type,
             self.e_machine,
             self.e_version,
@@ -194,52 +282,183 @@ class _DeriveSerialization(abc.ABC):
     """Helper class that derives the serialization methods from a use-given _format method."""
 
     _e_ident: ELFHeader.types.e_ident
+    # conversions applied to the unpacked fields by the generated constructors
+    _coercions: Dict[str, Callable[[int], int]] = {}
 
     def __init__(self, _e_ident: ELFHeader.types.e_ident, *args: int) -> None:
         raise NotImplementedError('Must define a __init__ for _DeriveSerialization types')
 
     @staticmethod
     @abc.abstractmethod
-    def _format(e_ident: ELFHeader.types.e_ident) -> str: ...
+    def _format(file_class: int, data_encoding: int) -> str: ...
+
+    @classmethod
+    def _struct(cls, e_ident: ELFHeader.types.e_ident) -> struct.Struct:
+        return _struct_for(cls, e_ident.file_class, e_ident.data_encoding)
+
+    @classmethod
+    def _field_names(cls, file_class: int) -> Tuple[str, ...]:
+        """Field names in the order they are serialized."""
+        # _DeriveSerialization types are _Printable dataclasses
+        names = typing.cast(Type[_Printable], cls)._public_fields()
+        assert names is not None
+        return names
+
+    @classmethod
+    def _from_tuple(cls: Type[T], e_ident: ELFHeader.types.e_ident, values: Tuple[int, ...]) -> T:
+        constructor: Callable[[ELFHeader.types.e_ident, Tuple[int, ...]], T]
+        constructor = _constructor_for(cls, e_ident.file_class)
+        return constructor(e_ident, values)
 
     @classmethod
-    def from_bytes(cls: Type[T], data: bytes, e_ident: ELFHeader.types.e_ident) -> T:
-        return cls(e_ident, *struct.unpack(cls._format(e_ident), data))
+    def from_bytes(
+        cls: Type[T],
+        data: Union[bytes, memoryview],
+        e_ident: ELFHeader.types.e_ident,
+        offset: int = 0,
+    ) -> T:
+        return cls._from_tuple(e_ident, cls._struct(e_ident).unpack_from(data, offset))
 
     @classmethod
     def from_fd(cls: Type[T], fd: io.RawIOBase, e_ident: ELFHeader.types.e_ident) -> T:
-        data_format = cls._format(e_ident)
-        data = fd.read(struct.calcsize(data_format))
+        data = fd.read(cls.size(e_ident))
         assert data
         return cls.from_bytes(data, e_ident)
 
     @classmethod
     def multiple_from_bytes(
         cls: Type[T],
-        data: bytes,
+        data: Union[bytes, memoryview],
         count: int,
         e_ident: ELFHeader.types.e_ident,
+        offset: int = 0,
     ) -> List[T]:
-        size = cls.size(e_ident)
+        unpacker = cls._struct(e_ident)
+        constructor: Callable[[ELFHeader.types.e_ident, Tuple[int, ...]], T]
+        constructor = _constructor_for(cls, e_ident.file_class)
+        # memoryview slices don't copy the underlying buffer
+        table = memoryview(data)[offset:offset+count*unpacker.size]
         return [
-            cls.from_bytes(data[i*size:(i+1)*size], e_ident)
-            for i in range(count)
+            constructor(e_ident, values)
+            for values in unpacker.iter_unpack(table)
         ]
 
+    @classmethod
+    def as_ndarray(
+        cls,
+        data: Union[bytes, memoryview],
+        count: int,
+        e_ident: ELFHeader.types.e_ident,
+        offset: int = 0,
+    ) -> numpy.ndarray[Any, Any]:
+        """Structured numpy array over the raw table, without building any objects.
+
+        The array is in native byte order, foreign-endian tables are byteswapped in one go.
+        Requires numpy to be installed.
+        """
+        import numpy
+
+        data_format = cls._struct(e_ident).format
+        endianess, codes = data_format[0], data_format[1:]
+        dtype = numpy.dtype([
+            (name, endianess + _NUMPY_CODES[code])
+            for name, code in zip(cls._field_names(e_ident.file_class), codes)
+        ])
+        if count == 0:
+            # empty tables usually have a zero offset in the header, don't try to map them
+            return numpy.empty(0, dtype=dtype.newbyteorder('='))
+        array = numpy.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        if not dtype.isnative:
+            array = array.byteswap().view(dtype.newbyteorder('='))
+        return array
+
     @classmethod
     def size(cls, e_ident: ELFHeader.types.e_ident) -> int:
-        return struct.calcsize(cls._format(e_ident))
+        return cls._struct(e_ident).size
 
-    @functools.lru_cache(maxsize=None)
     def __len__(self) -> int:
         return self.size(self._e_ident)
 
     def __bytes__(self) -> bytes:
-        return struct.pack(
-            self._format(self._e_ident),
-            *dataclasses.fields(self),
+        return self._struct(self._e_ident).pack(*(
+            getattr(self, name)
+            for name in self._field_names(self._e_ident.file_class)
+        ))
+
+
+class _HeaderTable(_Printable, typing.Sequence[T]):
+    """Lazy sequence over a header table, entries are only parsed when accessed."""
+
+    def __init__(
+        self,
+        cls: Type[T],
+        data: Union[bytes, memoryview],
+        count: int,
+        e_ident: ELFHeader.types.e_ident,
+        offset: int = 0,
+    ) -> None:
+        self._cls = cls
+        self._data = data
+        self._e_ident = e_ident
+        self._offset = offset
+        self._size = cls.size(e_ident)
+        # empty tables usually have a zero offset in the header, so there is nothing to check
+        if count and (offset < 0 or offset + count * self._size > len(data)):
+            raise ELFException(
+                f'{cls.__name__} table out of bounds, {count} entries at offset `{offset}` '
+                f'do not fit in `{len(data)}` bytes'
+            )
+        self._entries: List[Optional[T]] = [None] * count
+
+    @property
+    def _name(self) -> str:
+        return ''
+
+    @property
+    def _values(self) -> Dict[int, T]:
+        return dict(enumerate(self))
+
+    def _items(self) -> Iterable[Tuple[int, T]]:
+        return enumerate(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[T]:
+        # fill all the missing entries with a single bulk parse of the table
+        if any(entry is None for entry in self._entries):
+            parsed = self._cls.multiple_from_bytes(self._data, len(self), self._e_ident, self._offset)
+            self._entries = [
+                new if entry is None else entry
+                for entry, new in zip(self._entries, parsed)
+            ]
+        return iter(typing.cast(List[T], self._entries))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, collections.abc.Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            entry == other_entry
+            for entry, other_entry in zip(self, other)
         )
 
+    @typing.overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @typing.overload
+    def __getitem__(self, index: slice) -> List[T]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[T, List[T]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        entry = self._entries[index]
+        if entry is None:
+            if index < 0:
+                index += len(self)
+            entry = self._cls.from_bytes(self._data, self._e_ident, self._offset + index * self._size)
+            self._entries[index] = entry
+        return entry
+
 
 @dataclasses.dataclass(repr=False)
 class ELFSectionHeader(_Printable, _DeriveSerialization):
@@ -258,23 +477,55 @@ class ELFSectionHeader(_Printable, _DeriveSerialization):
     sh_addralign: int
     sh_entsize: int
 
+    _coercions = {
+        'sh_type': SHT.from_value_fallback,
+        'sh_flags': SHF.from_value,
+    }
+
     def __post_init__(self) -> None:
-        self.sh_type = SHT.from_value_fallback(self.sh_type)
-        self.sh_flags = SHF.from_value(self.sh_flags)
+        for name, coerce in self._coercions.items():
+            setattr(self, name, coerce(getattr(self, name)))
 
     @staticmethod
-    def _format(e_ident: ELFHeader.types.e_ident) -> str:
-        return ''.join((
-            e_ident.endianess,
-            'II',
-            e_ident.native,
-            e_ident.native,
-            e_ident.native,
-            e_ident.native,
-            'II',
-            e_ident.native,
-            e_ident.native,
-        ))
+    def _format(file_class: int, data_encoding: int) -> str:
+        return _SHDR_FMT[_endianess(data_encoding), _native(file_class)]
+
+    def contents(self, elf: ELF) -> memoryview:
+        """Section contents, as a view into the ELF data (empty for SHT.NOBITS sections)."""
+        if self.sh_type == SHT.NOBITS or self.sh_size == 0:
+            return elf.data[:0]
+        offset = self.sh_offset - len(elf.header)
+        if offset < 0 or offset + self.sh_size > elf.data.nbytes:
+            raise ELFException(
+                f'Section contents out of bounds, `{self.sh_size}` bytes at offset `{self.sh_offset}` '
+                f'do not fit in the file data'
+            )
+        return elf.data[offset:offset+self.sh_size]
+
+
+# the position of p_flags depends on the file class
+_PHDR_FIELD_ORDER = {
+    ELFCLASS._32: (
+        'p_type',
+        'p_offset',
+        'p_vaddr',
+        'p_paddr',
+        'p_filesz',
+        'p_memsz',
+        'p_flags',
+        'p_align',
+    ),
+    ELFCLASS._64: (
+        'p_type',
+        'p_flags',
+        'p_offset',
+        'p_vaddr',
+        'p_paddr',
+        'p_filesz',
+        'p_memsz',
+        'p_align',
+    ),
+}
 
 
 @dataclasses.dataclass(repr=False)
@@ -299,39 +550,21 @@ class ELFProgramHeader(_Printable, _DeriveSerialization):
     ) -> None:
         if len(args) != 8:
             raise ValueError(f'Required 8 arguments, got {len(args)}')
+        try:
+            field_order = _PHDR_FIELD_ORDER[_e_ident.file_class]
+        except KeyError:
+            raise ValueError(f'Unkown class: {_e_ident.file_class}') from None
         self._e_ident = _e_ident
-        if _e_ident.file_class == ELFCLASS._32:
-            (
-                self.p_type,
-                self.p_offset,
-                self.p_vaddr,
-                self.p_paddr,
-                self.p_filesz,
-                self.p_memsz,
-                self.p_flags,
-                self.p_align,
-            ) = args
-        elif _e_ident.file_class == ELFCLASS._64:
-            (
-                self.p_type,
-                self.p_flags,
-                self.p_offset,
-                self.p_vaddr,
-                self.p_paddr,
-                self.p_filesz,
-                self.p_memsz,
-                self.p_align,
-            ) = args
-        else:
-            raise ValueError(f'Unkown class: {_e_ident.file_class}')
+        for name, value in zip(field_order, args):
+            setattr(self, name, value)
+
+    @classmethod
+    def _field_names(cls, file_class: int) -> Tuple[str, ...]:
+        return _PHDR_FIELD_ORDER[file_class]
 
     @staticmethod
-    def _format(e_ident: ELFHeader.types.e_ident) -> str:
-        if e_ident.file_class == ELFCLASS._32:
-            return 'IIIIIIII'
-        elif e_ident.file_class == ELFCLASS._64:
-            return 'IIQQQQQQ'
-        raise ValueError(f'Unkown class: {e_ident.file_class}')
+    def _format(file_class: int, data_encoding: int) -> str:
+        return _PHDR_FMT[_endianess(data_encoding), _native(file_class)]
 
 
 @dataclasses.dataclass(repr=False)
@@ -339,28 +572,42 @@ class ELF(_Printable):
     """ELF file."""
 
     header: ELFHeader
-    section_headers: List[ELFSectionHeader]
-    program_headers: List[ELFProgramHeader]
-    data: bytes
+    section_headers: Sequence[ELFSectionHeader]
+    program_headers: Sequence[ELFProgramHeader]
+    data: memoryview
+
+    @staticmethod
+    def _map(fd: io.RawIOBase) -> memoryview:
+        """Maps the rest of the file in memory, falling back to reading it when it can't be mapped."""
+        start = fd.tell()
+        try:
+            mapped = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # not a real file (io.UnsupportedOperation), empty, etc.
+            return memoryview(fd.read())
+        fd.seek(0, io.SEEK_END)
+        # the memoryview holds a reference to the mapping, keeping it alive
+        return memoryview(mapped)[start:]
 
     @classmethod
     def from_fd(cls, fd: io.RawIOBase) -> ELF:
         header = ELFHeader.from_fd(fd)
-        data = fd.read()
+        data = cls._map(fd)
         assert data
         # section headers
-        offset = header.e_shoff - len(header)
-        section_headers = ELFSectionHeader.multiple_from_bytes(
-            data[offset:offset+(header.e_shentsize*header.e_shnum)],
+        section_headers = _HeaderTable(
+            ELFSectionHeader,
+            data,
             header.e_shnum,
             header.e_ident,
+            header.e_shoff - len(header),
         )
         # program headers
-        offset = header.e_phoff - len(header)
-        program_headers = ELFProgramHeader.multiple_from_bytes(
-            data[offset:offset+(header.e_phentsize*header.e_phnum)],
+        program_headers = _HeaderTable(
+            ELFProgramHeader,
+            data,
             header.e_phnum,
             header.e_ident,
+            header.e_phoff - len(header),
         )
         return cls(header, section_headers, program_headers, data)
 
@@ -370,8 +617,26 @@ class ELF(_Printable):
             assert isinstance(fd, io.RawIOBase)  # oh silly typeshed
             return cls.from_fd(fd)
 
+    @property
+    def section_header_array(self) -> numpy.ndarray[Any, Any]:
+        """Section header table as a structured numpy array (eg. ``elf.section_header_array['sh_offset']``).
+
+        Requires numpy to be installed.
+        """
+        return ELFSectionHeader.as_ndarray(
+            self.data,
+            self.header.e_shnum,
+            self.header.e_ident,
+            self.header.e_shoff - len(self.header),
+        )
+
+    def section_data(self, index: int) -> memoryview:
+        """Contents of the section at the given index, see ELFSectionHeader.contents."""
+        return self.section_headers[index].contents(self)
+
     def __len__(self) -> int:
-        return len(self.header) + len(self.data)
+        return len(self.header) + self.data.nbytes
 
     def __bytes__(self) -> bytes:
+        # only materialized on demand, self.data may be backed by a file mapping
         return bytes(self.header) + self.data
@@ -5,7 +5,7 @@ from elfo._util import _Enum, _EnumFlagItem
 
 class EI(_Enum):
     ## e_ident
-    NIDENT = 0x0f  # size
+    NIDENT = 0x10  # size
     # indexes
     CLASS = 0x04
     DATA = 0x05
@@ -2,7 +2,12 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, Sequence, Tuple, Type, Union
+import dataclasses
+import io
+import sys
+import typing
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type, Union
 
 
 class _Printable():
@@ -14,38 +19,74 @@ class _Printable():
     def _pad(self, level: int) -> str:
         return '  ' * level
 
-    def _repr(self, level: int) -> str:
-        def value_repr(value: Any) -> str:
+    def _value_repr(self, value: Any) -> str:
+        if isinstance(value, bytes) and len(value) > 32:
+            return f'<bytes: size={len(value)}>'
+        elif isinstance(value, memoryview):
+            return f'<memoryview: size={value.nbytes}>'
+        elif isinstance(value, int) and not isinstance(value, _EnumItem):
+            hex_repr = f'{value:x}'
+            hex_repr = ('0' * (len(hex_repr) % 2)) + hex_repr
+            return f'0x{hex_repr}'
+        return repr(value)
+
+    def _write_repr(self, writer: io.StringIO, level: int) -> None:
+        pad = self._pad(level + 1)
+        writer.write(self._name)
+        writer.write('(\n')
+        for key, value in self._items():
+            writer.write(f'{pad}{key}=')
             # custom printers
             if isinstance(value, list):
                 value = _PrintableSequence(value)
             # print
             if isinstance(value, _Printable):
-                return value._repr(level + 1)
-            elif isinstance(value, bytes) and len(value) > 32:
-                return f'<bytes: size={len(value)}>'
-            elif isinstance(value, int) and not isinstance(value, _EnumItem):
-                hex_repr = f'{value:x}'
-                hex_repr = ('0' * (len(hex_repr) % 2)) + hex_repr
-                return f'0x{hex_repr}'
-            return repr(value)
-
-        return '{}(\n{}{})'.format(self._name, ''.join(
-            '{}{}={},\n'.format(self._pad(level + 1), key, value_repr(value))
-            for key, value in self._values.items()
-        ), self._pad(level))
+                value._write_repr(writer, level + 1)
+            else:
+                writer.write(self._value_repr(value))
+            writer.write(',\n')
+        writer.write(self._pad(level))
+        writer.write(')')
+
+    def _repr(self, level: int) -> str:
+        writer = io.StringIO()
+        self._write_repr(writer, level)
+        return writer.getvalue()
+
+    def _items(self) -> Iterable[Tuple[Any, Any]]:
+        return self._values.items()
 
     @property
     def _name(self) -> str:
         return self.__class__.__name__
 
+    @classmethod
+    def _public_fields(cls) -> Optional[Tuple[str, ...]]:
+        """Public dataclass field names, or None if the class is not a dataclass.
+
+        Computed on first use, as the dataclass decorator only runs after __init_subclass__.
+        """
+        if '_public_fields_cache' not in cls.__dict__:
+            names = None
+            if dataclasses.is_dataclass(cls):
+                names = tuple(
+                    field.name
+                    for field in dataclasses.fields(cls)
+                    if not field.name.startswith('_')
+                )
+            setattr(cls, '_public_fields_cache', names)
+        return typing.cast(Optional[Tuple[str, ...]], cls.__dict__['_public_fields_cache'])
+
     @property
     def _values(self) -> Dict[Any, Any]:
-        return {
-            key: value
-            for key, value in vars(self).items()
-            if not key.startswith('_')
-        }
+        names = self._public_fields()
+        if names is None:
+            return {
+                key: value
+                for key, value in vars(self).items()
+                if not key.startswith('_')
+            }
+        return {name: getattr(self, name) for name in names}
 
     def __repr__(self) -> str:
         return self._repr(0)
@@ -63,17 +104,26 @@ class _PrintableSequence(_Printable):
     def _values(self) -> Dict[int, Any]:
         return dict(enumerate(self.sequence))
 
+    def _items(self) -> Iterable[Tuple[int, Any]]:
+        return enumerate(self.sequence)
+
 
 class _EnumItem(int):
     """Custom int that tracks the enum name."""
 
-    name: str
+    _owner: str
+    _key: str
 
-    def __new__(cls, value: int, name: str) -> _EnumItem:
+    def __new__(cls, value: int, owner: str, key: str) -> _EnumItem:
         obj = super().__new__(cls, value)
-        obj.name = name
+        obj._owner = owner
+        obj._key = key
         return obj
 
+    @property
+    def name(self) -> str:
+        return f'{self._owner}.{self._key}'
+
     def __repr__(self) -> str:
         return f'<{self.name}: {int(self)}>'
 
@@ -103,13 +153,17 @@ class _FlagMatch(int, _Printable):
 
     @property
     def _values(self) -> Dict[str, Any]:
+        # plain int operations, skipping the _EnumFlagItem.__eq__ dispatch for every flag
+        value = int(self)
         return {
-            flag.name: flag == self
+            flag.name: bool(value & flag)
             for flag in self.flags
         }
 
 
 class _EnumMeta(type):
+    _value_map: Dict[int, _EnumItem]
+
     def __new__(
         mcs,
         name: str,
@@ -117,38 +171,41 @@ class _EnumMeta(type):
         dict_: Dict[str, Any],
         item_cls: Type[_EnumItem] = _EnumItem,
     ) -> _EnumMeta:
+        owner = sys.intern(name)
         new_dict = {
-            key: item_cls(value, f'{name}.{key}') if isinstance(value, int) else value
+            key: item_cls(value, owner, key) if isinstance(value, int) else value
             for key, value in dict_.items()
         }
-        new_dict.update({'_item_cls': item_cls})
+        items = [value for value in new_dict.values() if isinstance(value, _EnumItem)]
+        value_map: Dict[int, _EnumItem] = {}
+        for item in items:
+            value_map.setdefault(int(item), item)
+        new_dict.update({
+            '_item_cls': item_cls,
+            '_items': items,
+            '_value_map': value_map,
+        })
         return super().__new__(mcs, name, bases, new_dict)
 
     @property
     def value_dict(self) -> Dict[int, _EnumItem]:
-        return {
-            int(value): value
-            for value in vars(self).values()
-            if isinstance(value, _EnumItem)
-        }
+        return dict(self._value_map)
 
 
 class _Enum(metaclass=_EnumMeta):
     _item_cls: Type[_EnumItem]
+    _items: List[_EnumItem]
+    _value_map: Dict[int, _EnumItem]
 
     @classmethod
     def from_value(cls, value: int) -> Union[_EnumItem, _FlagMatch]:
         if cls._item_cls is _EnumFlagItem:
-            return _FlagMatch(value, [
-                value for value in vars(cls).values()
-                if isinstance(value, _EnumFlagItem)
-            ])
-
-        for item in vars(cls).values():
-            if item == value:
-                assert isinstance(item, _EnumItem)
-                return item
-        raise ValueError(f'Item not found for 0x{value:x} in {cls.__name__}')
+            return _FlagMatch(value, typing.cast(List[_EnumFlagItem], cls._items))
+
+        try:
+            return cls._value_map[value]
+        except KeyError:
+            raise ValueError(f'Item not found for 0x{value:x} in {cls.__name__}') from None
 
     @classmethod
     def from_value_fallback(cls, value: int) -> int:
@@ -12,3 +12,10 @@ def mypy(session):
     session.install('.', 'mypy')
 
     session.run('mypy', '-p', 'elfo')
+
+
+@nox.session(python=['3.7', '3.8', '3.9'])
+def test(session):
+    session.install('.[test]')
+
+    session.run('pytest', '--cov=elfo', *session.posargs)
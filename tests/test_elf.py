@@ -0,0 +1,154 @@
+# SPDX-License-Identifier: EUPL-1.2
+
+import io
+import struct
+
+import pytest
+
+import elfo
+
+
+CONTENTS = b'elfo section contents\x00'
+
+ELF_VARIANTS = [
+    (elfo.ELFCLASS._32, elfo.ELFDATA.LSB),
+    (elfo.ELFCLASS._32, elfo.ELFDATA.MSB),
+    (elfo.ELFCLASS._64, elfo.ELFDATA.LSB),
+    (elfo.ELFCLASS._64, elfo.ELFDATA.MSB),
+]
+
+
+def build_elf(file_class, data_encoding, program_headers=True):
+    """Builds a small ELF file: header, program headers, section contents and section headers."""
+    endianess = '<' if data_encoding == elfo.ELFDATA.LSB else '>'
+    native = 'I' if file_class == elfo.ELFCLASS._32 else 'Q'
+    ehsize, phentsize, shentsize = (52, 32, 40) if file_class == elfo.ELFCLASS._32 else (64, 56, 64)
+
+    phnum = 2 if program_headers else 0
+    phoff = ehsize if program_headers else 0
+    contents_offset = ehsize + phnum * phentsize
+    shoff = contents_offset + len(CONTENTS)
+
+    # (p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, p_align)
+    phdrs = [
+        (6, phoff, 0x40, 0x40, phnum * phentsize, phnum * phentsize, 4, 8),
+        (1, contents_offset, 0x1000, 0x1000, len(CONTENTS), len(CONTENTS), 5, 0x1000),
+    ][:phnum]
+    # (sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size, sh_link, sh_info, sh_addralign, sh_entsize)
+    shdrs = [
+        (0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (1, elfo.SHT.PROGBITS, 0x6, 0x1000, contents_offset, len(CONTENTS), 0, 0, 1, 0),
+        (7, elfo.SHT.NOBITS, 0x3, 0x2000, shoff, 0x100, 0, 0, 8, 0),
+    ]
+
+    e_ident = b'\x7fELF' + bytes([file_class, data_encoding, 1, 0, 0]) + b'\x00' * 7
+    header = e_ident + struct.pack(
+        f'{endianess}HHI{native}{native}{native}IHHHHHH',
+        elfo.ET.EXEC, elfo.EM.X86_64, elfo.EV.CURRENT, 0x1000, phoff, shoff, 0,
+        ehsize, phentsize, phnum, shentsize, len(shdrs), 0,
+    )
+    if file_class == elfo.ELFCLASS._32:
+        phdr_format = f'{endianess}IIIIIIII'
+        phdr_table = b''.join(struct.pack(phdr_format, *phdr) for phdr in phdrs)
+    else:
+        phdr_format = f'{endianess}IIQQQQQQ'
+        phdr_table = b''.join(
+            struct.pack(phdr_format, p_type, p_flags, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_align)
+            for p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, p_align in phdrs
+        )
+    shdr_format = f'{endianess}II{native}{native}{native}{native}II{native}{native}'
+    shdr_table = b''.join(struct.pack(shdr_format, *shdr) for shdr in shdrs)
+
+    return header + phdr_table + CONTENTS + shdr_table
+
+
+@pytest.fixture(params=['path', 'fd'])
+def load(request, tmp_path):
+    def loader(data):
+        if request.param == 'path':
+            path = tmp_path / 'test.elf'
+            path.write_bytes(data)
+            return elfo.ELF.from_path(str(path))
+        return elfo.ELF.from_fd(io.BytesIO(data))
+    return loader
+
+
+@pytest.mark.parametrize(('file_class', 'data_encoding'), ELF_VARIANTS)
+def test_roundtrip(load, file_class, data_encoding):
+    data = build_elf(file_class, data_encoding)
+    elf = load(data)
+
+    assert bytes(elf) == data
+    assert len(elf) == len(data)
+    assert bytes(elf.header) == data[:elf.header.e_ehsize]
+
+
+@pytest.mark.parametrize(('file_class', 'data_encoding'), ELF_VARIANTS)
+def test_header_tables_roundtrip(load, file_class, data_encoding):
+    data = build_elf(file_class, data_encoding)
+    elf = load(data)
+    header = elf.header
+
+    assert len(elf.section_headers) == header.e_shnum == 3
+    for i, section_header in enumerate(elf.section_headers):
+        offset = header.e_shoff + i * header.e_shentsize
+        assert bytes(section_header) == data[offset:offset+header.e_shentsize]
+
+    assert len(elf.program_headers) == header.e_phnum == 2
+    for i, program_header in enumerate(elf.program_headers):
+        offset = header.e_phoff + i * header.e_phentsize
+        assert bytes(program_header) == data[offset:offset+header.e_phentsize]
+
+
+@pytest.mark.parametrize(('file_class', 'data_encoding'), ELF_VARIANTS)
+def test_fields(load, file_class, data_encoding):
+    elf = load(build_elf(file_class, data_encoding))
+
+    assert elf.header.e_ident.file_class == file_class
+    assert elf.header.e_ident.data_encoding == data_encoding
+    assert elf.header.e_machine == elfo.EM.X86_64
+    assert elf.section_headers[1].sh_type == elfo.SHT.PROGBITS
+    assert elf.section_headers[2].sh_type == elfo.SHT.NOBITS
+    assert elf.program_headers[1].p_flags == 5
+    assert elf.program_headers[1].p_align == 0x1000
+
+
+@pytest.mark.parametrize(('file_class', 'data_encoding'), ELF_VARIANTS)
+def test_section_contents(load, file_class, data_encoding):
+    elf = load(build_elf(file_class, data_encoding))
+
+    assert bytes(elf.section_data(1)) == CONTENTS
+    assert bytes(elf.section_data(2)) == b''
+
+
+def test_section_contents_out_of_bounds(load):
+    elf = load(build_elf(elfo.ELFCLASS._64, elfo.ELFDATA.LSB))
+    section_header = elf.section_headers[1]
+    section_header.sh_offset = 10
+
+    with pytest.raises(elfo.ELFException):
+        section_header.contents(elf)
+
+
+@pytest.mark.parametrize(('file_class', 'data_encoding'), ELF_VARIANTS)
+def test_no_program_headers(load, file_class, data_encoding):
+    # like relocatable objects: e_phnum=0 and e_phoff=0
+    data = build_elf(file_class, data_encoding, program_headers=False)
+    elf = load(data)
+
+    assert elf.header.e_phnum == 0
+    assert elf.header.e_phoff == 0
+    assert len(elf.program_headers) == 0
+    assert list(elf.program_headers) == []
+    assert bytes(elf) == data
+
+
+def test_equality(load):
+    data = build_elf(elfo.ELFCLASS._64, elfo.ELFDATA.LSB)
+
+    assert load(data) == load(data)
+
+
+def test_not_an_elf(load):
+    with pytest.raises(elfo.NotAnELF):
+        load(b'\x7fEL')